@@ -1,6 +1,8 @@
 from typing import List
 from pydantic import BaseModel
-import datetime as dt
+import numpy as np
+
+_CONDITIONS = np.array(["clear", "partly cloudy", "light rain"])
 
 class WeatherSummary(BaseModel):
     city: str
@@ -11,18 +13,13 @@ class WeatherSummary(BaseModel):
 
 async def weather_agent(city: str, start_date: str, end_date: str) -> WeatherSummary:
     # TODO: Replace with OpenWeather/VisualCrossing/etc.
-    start = dt.date.fromisoformat(start_date)
-    end = dt.date.fromisoformat(end_date)
-    days = (end - start).days + 1
-
-    highs = [26.0 + i % 3 for i in range(days)]
-    lows  = [18.0 + i % 3 for i in range(days)]
-    conds = ["clear", "partly cloudy", "light rain"] * ((days // 3) + 1)
-
+    start = np.datetime64(start_date, "D")
+    days = int((np.datetime64(end_date, "D") - start).astype(np.int64)) + 1
+    idx = np.arange(max(days, 0), dtype=np.int64)
     return WeatherSummary(
         city=city,
-        dates=[(start + dt.timedelta(days=i)).isoformat() for i in range(days)],
-        highs_c=highs[:days],
-        lows_c=lows[:days],
-        conditions=conds[:days],
-    )
\ No newline at end of file
+        dates=(start + idx).astype(str).tolist(),
+        highs_c=(26.0 + idx % 3).tolist(),
+        lows_c=(18.0 + idx % 3).tolist(),
+        conditions=_CONDITIONS[idx % 3].tolist(),
+    )
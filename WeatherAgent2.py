@@ -1,8 +1,20 @@
-import requests
+import asyncio
+import httpx
 import datetime as dt
 from typing import List
 from pydantic import BaseModel
 
+# Reused across calls so repeat city lookups skip the TCP/TLS handshake.
+_client = httpx.AsyncClient(
+    timeout=10,
+    http2=True,
+    limits=httpx.Limits(max_keepalive_connections=20),
+)
+
+async def aclose() -> None:
+    # Call from the owning event loop's shutdown/lifespan hook (see the example below).
+    await _client.aclose()
+
 class WeatherSummary(BaseModel):
     city: str
     dates: List[str]
@@ -20,9 +32,13 @@ async def weather_agent(city: str, start_date: str, end_date: str) -> WeatherSum
         "key": api_key
     }
 
-    response = requests.get(url, params=params)
-    if response.status_code != 200:
-        raise Exception(f"Error fetching data: {response.status_code} - {response.text}")
+    response = await _client.get(url, params=params)
+    if response.is_error:
+        raise httpx.HTTPStatusError(
+            f"Error fetching data: {response.status_code} - {response.text}",
+            request=response.request,
+            response=response,
+        )
 
     data = response.json()
     days = data.get("days", [])
@@ -33,4 +49,16 @@ async def weather_agent(city: str, start_date: str, end_date: str) -> WeatherSum
         highs_c=[day["tempmax"] for day in days],
         lows_c=[day["tempmin"] for day in days],
         conditions=[day["conditions"] for day in days]
-    )
\ No newline at end of file
+    )
+
+# =========================
+# Example Usage
+# =========================
+async def example():
+    try:
+        print(await weather_agent("Vancouver", "2025-10-10", "2025-10-14"))
+    finally:
+        await aclose()
+
+if __name__ == "__main__":
+    asyncio.run(example())
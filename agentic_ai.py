@@ -1,17 +1,20 @@
 
-from openai import OpenAI
-import os
+import functools
+from collections import deque
 
-from dotenv import load_dotenv
-load_dotenv()   
-
-# Set your OpenAI API key
-client = OpenAI() #OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Created on first use so importing this module doesn't load the SDK or read credentials.
+@functools.cache
+def _client():
+    from openai import OpenAI
+    from dotenv import load_dotenv
+    load_dotenv()
+    # Set your OpenAI API key
+    return OpenAI() #OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Real LLM integration
 class OpenAIGenerativeModel:
     def generate(self, prompt):
-        response = client.chat.completions.create(
+        response = _client().chat.completions.create(
             model="gpt-5",  # or "gpt-3.5-turbo"
             messages=[
                 {"role": "system", "content": "You are a helpful agentic AI assistant."},
@@ -23,14 +26,15 @@ class OpenAIGenerativeModel:
 
 # Memory module
 class Memory:
-    def __init__(self):
-        self.history = []
+    def __init__(self, size=5):
+        # Bounded so long-running agents don't accumulate every interaction.
+        self.history = deque(maxlen=size)
 
     def remember(self, interaction):
         self.history.append(interaction)
 
     def recall(self):
-        return self.history[-5:]
+        return list(self.history)
 
 # Goal planner
 class GoalPlanner:
@@ -68,12 +72,13 @@ class AgenticAI:
         }
 
 # Example usage
-agent = AgenticAI()
-result = agent.interact("Build a chatbot for customer support", tool_name="WebSearch", tool_input="Chatbot frameworks")
+if __name__ == "__main__":
+    agent = AgenticAI()
+    result = agent.interact("Build a chatbot for customer support", tool_name="WebSearch", tool_input="Chatbot frameworks")
 
-print("Agentic Plan:", result["plan"])
-print("Recent Memory:", result["recent_memory"])
-if result["tool_result"]:
-    print("Tool Result:", result["tool_result"])
-else:
-    print("No tool result.")
\ No newline at end of file
+    print("Agentic Plan:", result["plan"])
+    print("Recent Memory:", result["recent_memory"])
+    if result["tool_result"]:
+        print("Tool Result:", result["tool_result"])
+    else:
+        print("No tool result.")
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    from openai.types.chat import ChatCompletion
+
+# =========================
+# Config
+# =========================
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.sqlite3")
+CACHE_TTL_SECONDS = 24 * 60 * 60
+MAX_CACHEABLE_TEMPERATURE = 0.3
+
+# Request fields that determine the completion; anything else (timeouts, cache hints) is ignored.
+_KEY_FIELDS = ("model", "messages", "tools", "tool_choice", "temperature", "response_format")
+
+_conn: Optional[sqlite3.Connection] = None
+# One connection is shared by every caller thread (e.g. asyncio.to_thread workers).
+_lock = threading.Lock()
+
+def _db() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, expires_at REAL, body TEXT)"
+        )
+    return _conn
+
+# =========================
+# Exact-match cache
+# =========================
+def cache_key(request: Dict[str, Any]) -> str:
+    payload = json.dumps({k: request.get(k) for k in _KEY_FIELDS}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode()).hexdigest()
+
+def cacheable(request: Dict[str, Any]) -> bool:
+    temperature = request.get("temperature")
+    return temperature is not None and temperature <= MAX_CACHEABLE_TEMPERATURE
+
+def lookup(request: Dict[str, Any]) -> Optional[ChatCompletion]:
+    if not cacheable(request):
+        return None
+    with _lock:
+        row = _db().execute(
+            "SELECT body FROM completions WHERE key = ? AND expires_at > ?",
+            (cache_key(request), time.time()),
+        ).fetchone()
+    if not row:
+        return None
+    from openai.types.chat import ChatCompletion
+    return ChatCompletion.model_validate_json(row[0])
+
+def store(request: Dict[str, Any], completion: ChatCompletion) -> None:
+    # Tool-call turns depend on live tool output, so only terminal answers are reusable.
+    if not cacheable(request) or completion.choices[0].message.tool_calls:
+        return
+    now = time.time()
+    with _lock, _db() as conn:
+        # Expired rows are never read again; drop them so the file stays bounded.
+        conn.execute("DELETE FROM completions WHERE expires_at <= ?", (now,))
+        conn.execute(
+            "INSERT OR REPLACE INTO completions VALUES (?, ?, ?)",
+            (cache_key(request), now + CACHE_TTL_SECONDS, completion.model_dump_json()),
+        )
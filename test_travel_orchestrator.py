@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import asyncio
+import tempfile
+import unittest
+import importlib.util
+from unittest import mock
+
+import httpx
+import openai
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+os.environ["LLM_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "llm_cache.sqlite3")
+sys.path.insert(0, HERE)
+
+# The module name has a hyphen, so it can't be imported normally.
+_spec = importlib.util.spec_from_file_location("travel_orchestrator", os.path.join(HERE, "travel-orchestrator.py"))
+orchestrator = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(orchestrator)
+
+PREFS = orchestrator.TravelerPrefs(
+    origin="SFO", destination="Vancouver", depart_date="2025-10-10", return_date=None,
+)
+FLIGHT_ARGS = json.dumps({"prefs": PREFS.model_dump(mode="json")})
+ITINERARY = json.dumps({
+    "summary": "Test trip", "flights": [], "hotel": None, "weather": None,
+    "est_total_currency": "USD", "est_total_amount": 0,
+})
+
+
+def _chunk(delta, finish_reason=None):
+    return {
+        "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": "gpt-5",
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+
+
+def _tool_call(index, call_id, name, arguments):
+    return _chunk({"tool_calls": [{
+        "index": index, "id": call_id, "type": "function",
+        "function": {"name": name, "arguments": arguments},
+    }]})
+
+
+def _sse(chunks):
+    return "".join(f"data: {json.dumps(c)}\n\n" for c in chunks) + "data: [DONE]\n\n"
+
+
+class _DroppedStream(httpx.AsyncByteStream):
+    """SSE body that loses the connection after the given chunks."""
+
+    def __init__(self, chunks):
+        self.lines = [f"data: {json.dumps(c)}\n\n".encode() for c in chunks]
+
+    async def __aiter__(self):
+        for line in self.lines:
+            yield line
+        await asyncio.sleep(0.01)  # a real socket read yields to the loop before failing
+        raise httpx.ReadError("connection reset")
+
+
+def _client(handler):
+    transport = httpx.MockTransport(handler)
+    return openai.AsyncOpenAI(api_key="test", max_retries=0, http_client=httpx.AsyncClient(transport=transport))
+
+
+# =========================
+# Streaming turn failures
+# =========================
+class StreamFailureTest(unittest.IsolatedAsyncioTestCase):
+    async def test_dropped_stream_cancels_started_tools(self):
+        started, finished = [], []
+
+        async def slow_flights(prefs):
+            started.append(prefs)
+            await asyncio.sleep(0.05)
+            finished.append(prefs)
+            return []
+
+        # The second tool call completes the first one's arguments, then the connection drops.
+        stream = _DroppedStream([
+            _chunk({"role": "assistant", "content": None}),
+            _tool_call(0, "call_0", "call_flights_agent", FLIGHT_ARGS),
+            _tool_call(1, "call_1", "call_weather_agent", ""),
+        ])
+
+        def handler(request):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=stream)
+
+        client = _client(handler)
+        with mock.patch.object(orchestrator, "_client", lambda: client), \
+                mock.patch.object(orchestrator, "flights_agent", slow_flights):
+            with self.assertRaises(Exception):
+                await orchestrator.TravelOrchestrator().run("Plan a trip", PREFS)
+            await asyncio.sleep(0.1)
+
+        self.assertEqual(len(started), 1)
+        self.assertEqual(finished, [])
+        self.assertEqual([t for t in asyncio.all_tasks() if t is not asyncio.current_task()], [])
+
+
+
+# =========================
+# Bad tool arguments
+# =========================
+class ToolArgumentsTest(unittest.IsolatedAsyncioTestCase):
+    async def test_bad_arguments_are_returned_to_gpt(self):
+        bad_calls = [
+            ("call_0", "call_hotels_agent", {
+                "destination": "Vancouver", "checkin": "tomorrow", "checkout": "2025-10-12", "rooms": 1, "currency": "USD",
+            }),
+            ("call_1", "call_weather_agent", {"city": "Vancouver", "start_date": "soon", "end_date": "2025-10-12"}),
+            ("call_2", "finalize_booking", {"flight_index": 7}),
+            ("call_3", "call_unknown_agent", {}),
+        ]
+        turns = [
+            _sse(
+                [_chunk({"role": "assistant", "content": None})]
+                + [_tool_call(i, call_id, name, json.dumps(args)) for i, (call_id, name, args) in enumerate(bad_calls)]
+                + [_chunk({}, "tool_calls")]
+            ),
+            _sse([_chunk({"role": "assistant", "content": ITINERARY}), _chunk({}, "stop")]),
+        ]
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, text=turns[len(requests) - 1])
+
+        client = _client(handler)
+        with mock.patch.object(orchestrator, "_client", lambda: client):
+            itinerary = await orchestrator.TravelOrchestrator().run("Plan a trip", PREFS, auto_book=True)
+
+        self.assertEqual(itinerary.summary, "Test trip")
+        replies = {
+            m["tool_call_id"]: json.loads(m["content"])["result"]
+            for m in requests[1]["messages"] if m["role"] == "tool"
+        }
+        self.assertEqual(sorted(replies), [call_id for call_id, _, _ in bad_calls])
+        for reply in replies.values():
+            self.assertIn("error", reply)
+
+
+if __name__ == "__main__":
+    unittest.main()
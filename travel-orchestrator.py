@@ -1,27 +1,95 @@
 import os
 import asyncio
-import json
-from typing import Any, Dict
+import functools
+import hashlib
+import orjson
+import msgpack
+import weakref
+import fastjsonschema
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+
+import llm_cache
 
 from travel_domain_agents import (
     weather_agent, flights_agent, hotels_agent,
     events_agent, book_agent, TravelerPrefs, Itinerary,
-    FlightOption, HotelOption, TOOLS
+    WeatherSummary, FlightOption, HotelOption, EventOption,
+    TOOLS, TOOLS_JSON, TOOL_VALIDATORS, http_client, to_soa, singleflight
+)
+
+
+@functools.cache
+def _client() -> AsyncOpenAI:
+    # Built on first use so importing the orchestrator doesn't require credentials.
+    load_dotenv()
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        raise RuntimeError("Please set OPENAI_API_KEY")
+    return AsyncOpenAI(api_key=api_key)
+
+
+SYSTEM_PROMPT = (
+    "You are a senior travel-planning orchestrator. "
+    "Plan minimal tool calls, prefer parallelizable requests, and return a cohesive itinerary. "
+    "When making a plan: summarize, list chosen flight/hotel, include weather overview, key events, "
+    "and a day-by-day schedule. Keep budgets in the user's currency. "
+    "Flight, hotel and event results are columnar: one array per field, where index i "
+    "across the arrays is option i (use that index for finalize_booking). "
+    "Tool replies are {\"result\": ..., \"state\": ...}, where state summarizes everything gathered so far."
 )
 
-load_dotenv()
+# The system prompt + TOOLS prefix is identical on every turn and request; a stable
+# key derived from it routes requests to the server that already has that prefix cached.
+PROMPT_CACHE_KEY = "travel-orchestrator-" + hashlib.blake2b(
+    SYSTEM_PROMPT.encode() + TOOLS_JSON, digest_size=8
+).hexdigest()
+
+# Caps outbound tool calls across all orchestrators on an event loop; third-party
+# travel APIs rate-limit hard, and a burst of 429s costs more than queueing.
+TOOL_CONCURRENCY = 6
+# A semaphore binds to the first loop that waits on it, so keep one per running loop
+# (per-job asyncio.run workers would otherwise fail on their second run).
+_tool_semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+def _tool_semaphore() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _tool_semaphores.get(loop)
+    if sem is None:
+        sem = _tool_semaphores[loop] = asyncio.Semaphore(TOOL_CONCURRENCY)
+    return sem
+
+
+_PAYLOAD = TypeAdapter(Dict[str, Any])
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Please set OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+
+@functools.lru_cache(maxsize=128)
+def _prefs_from_json(raw: str) -> TravelerPrefs:
+    # GPT re-sends the same prefs across turns; validate each distinct payload once.
+    return TravelerPrefs.model_validate_json(raw)
 
 
 # =========================
 # Orchestrator
 # =========================
+class AccumState(BaseModel):
+    """Facts gathered so far in a run; GPT only ever sees the latest tool's slice of it."""
+    weather: Optional[WeatherSummary] = None
+    flights: List[FlightOption] = Field(default_factory=list)
+    hotels: List[HotelOption] = Field(default_factory=list)
+    events: List[EventOption] = Field(default_factory=list)
+    booking: Optional[Dict[str, Any]] = None
+
+    def summary(self) -> str:
+        return (
+            f"accumulator has: flights={len(self.flights)}, hotels={len(self.hotels)}, "
+            f"events={len(self.events)}, weather={'set' if self.weather else 'unset'}, "
+            f"booking={'set' if self.booking else 'unset'}"
+        )
+
 class TravelOrchestrator:
     """
     A loop that:
@@ -31,115 +99,235 @@ class TravelOrchestrator:
     """
 
     def __init__(self):
-        self.accumulator: Dict[str, Any] = {
-            "weather": None,
-            "flights": [],
-            "hotels": [],
-            "events": [],
-            "booking": None,
-        }
+        # Holds model instances; they are serialized only when handed back to GPT.
+        self.accumulator = AccumState()
+        # msgpack-encoded accumulator after each tool turn, for audit/replay.
+        self.snapshots: List[bytes] = []
+        # In-flight tool calls keyed by (tool name, sorted-key args); identical calls share one task.
+        self._inflight: Dict[Tuple[str, bytes], asyncio.Future] = {}
+        # Billed vs. provider-cached prompt tokens across this run's GPT turns.
+        self.usage: Dict[str, int] = {"prompt_tokens": 0, "cached_tokens": 0}
 
-    async def run(self, user_goal: str, default_prefs: TravelerPrefs, auto_book: bool = False) -> Itinerary:
-        sys = (
-            "You are a senior travel-planning orchestrator. "
-            "Plan minimal tool calls, prefer parallelizable requests, and return a cohesive itinerary. "
-            "When making a plan: summarize, list chosen flight/hotel, include weather overview, key events, "
-            "and a day-by-day schedule. Keep budgets in the user's currency."
+    def snapshot(self) -> bytes:
+        return msgpack.packb(self.accumulator.model_dump(mode="json"))
+
+    async def _finish_stream(self, stream) -> ChatCompletion:
+        resp = await stream.get_final_completion()
+        if resp.usage:
+            details = resp.usage.prompt_tokens_details
+            self.usage["prompt_tokens"] += resp.usage.prompt_tokens
+            self.usage["cached_tokens"] += (details.cached_tokens or 0) if details else 0
+        return resp
+
+    def _cancel_tools(self, tasks: Dict[str, asyncio.Future]) -> None:
+        # Waiters are shielded from the calls they share, so cancelling them alone
+        # would leave the agents running; cancel the underlying calls too.
+        for fut in (*tasks.values(), *self._inflight.values()):
+            fut.cancel()
+
+    async def _try_fast_path(self, prefs: TravelerPrefs) -> Optional[Dict[str, Any]]:
+        """
+        When `prefs` fully determines the agent arguments, fetch weather, flights,
+        hotels and events concurrently up front so GPT can plan in one turn
+        instead of requesting them over several round-trips.
+        Returns None when the tool-calling loop has to gather the facts itself.
+        """
+        if not prefs.return_date:
+            return None
+
+        results = await asyncio.gather(
+            weather_agent(prefs.destination, prefs.depart_date, prefs.return_date),
+            flights_agent(prefs),
+            hotels_agent(
+                prefs.destination, prefs.depart_date, prefs.return_date,
+                prefs.hotel_rooms, prefs.max_hotel_price_per_night, prefs.budget_currency,
+            ),
+            events_agent(prefs.destination, prefs.depart_date, prefs.return_date, prefs.interests),
+            return_exceptions=True,
         )
 
+        facts: Dict[str, Any] = {}
+        for key, res in zip(("weather", "flights", "hotels", "events"), results):
+            if isinstance(res, Exception):
+                # Leave the gap for GPT to retry via the matching tool.
+                facts[key] = {"error": f"{type(res).__name__}: {res}"}
+            else:
+                setattr(self.accumulator, key, res)
+                facts[key] = to_soa(res) if isinstance(res, list) else res
+        return facts
+
+    async def run(self, user_goal: str, default_prefs: TravelerPrefs, auto_book: bool = False) -> Itinerary:
+        request: Dict[str, Any] = {
+            "goal": user_goal,
+            "defaults": default_prefs,
+            "auto_book": auto_book,
+            "notes": "Use tools to fetch facts; then produce a final structured itinerary JSON matching the Itinerary schema."
+        }
+        facts = await self._try_fast_path(default_prefs)
+        if facts is not None:
+            request["facts"] = facts
+            request["notes"] = (
+                "Weather, flights, hotels and events are already fetched in `facts`. "
+                "Only call tools to fill an entry marked as an error or to book (when auto_book is true); "
+                "otherwise produce the final structured itinerary JSON matching the Itinerary schema now."
+            )
+
         messages = [
-            {"role": "system", "content": sys},
-            {
-                "role": "user",
-                "content": json.dumps({
-                    "goal": user_goal,
-                    "defaults": default_prefs.dict(),
-                    "notes": "Use tools to fetch facts; then produce a final structured itinerary JSON matching the Itinerary schema."
-                })
-            },
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": _PAYLOAD.dump_json(request, exclude_none=True).decode()},
         ]
 
         async def handle_tool(tool_name: str, args: Dict[str, Any]):
+            validate = TOOL_VALIDATORS.get(tool_name)
+            if validate is not None:
+                try:
+                    validate(args)
+                except fastjsonschema.JsonSchemaException as e:
+                    # Let GPT correct its arguments instead of failing the whole turn.
+                    return orjson.dumps({"error": f"invalid args: {e.message}"}).decode()
+
             if tool_name == "call_weather_agent":
                 res = await weather_agent(**args)
-                self.accumulator["weather"] = res.dict()
-                return json.dumps(self.accumulator["weather"])
+                self.accumulator.weather = res
+                return res.model_dump_json(exclude_none=True)
 
             if tool_name == "call_flights_agent":
-                prefs = TravelerPrefs(**args["prefs"])
+                prefs = _prefs_from_json(orjson.dumps(args["prefs"], option=orjson.OPT_SORT_KEYS).decode())
                 res = await flights_agent(prefs)
-                self.accumulator["flights"] = [r.dict() for r in res]
-                return json.dumps(self.accumulator["flights"])
+                self.accumulator.flights = res
+                return orjson.dumps(to_soa(res)).decode()
 
             if tool_name == "call_hotels_agent":
                 res = await hotels_agent(**args)
-                self.accumulator["hotels"] = [r.dict() for r in res]
-                return json.dumps(self.accumulator["hotels"])
+                self.accumulator.hotels = res
+                return orjson.dumps(to_soa(res)).decode()
 
             if tool_name == "call_events_agent":
                 res = await events_agent(**args)
-                self.accumulator["events"] = [r.dict() for r in res]
-                return json.dumps(self.accumulator["events"])
+                self.accumulator.events = res
+                return orjson.dumps(to_soa(res)).decode()
 
             if tool_name == "finalize_booking":
-                flights = self.accumulator.get("flights", [])
-                hotels = self.accumulator.get("hotels", [])
+                if not auto_book:
+                    # TOOLS stays fixed so the cached prompt prefix is shared with booking runs.
+                    return orjson.dumps({"error": "Booking is disabled for this request (auto_book is false)."}).decode()
+                flights = self.accumulator.flights
+                hotels = self.accumulator.hotels
                 fi = int(args["flight_index"])
                 hi = int(args.get("hotel_index", 0))
-                selected_flight = FlightOption(**flights[fi])
-                selected_hotel = HotelOption(**hotels[hi]) if hotels else None
+                if not 0 <= fi < len(flights) or (hotels and not 0 <= hi < len(hotels)):
+                    return orjson.dumps({
+                        "error": f"invalid args: {len(flights)} flight(s) and {len(hotels)} hotel(s) to choose from"
+                    }).decode()
+                selected_flight = flights[fi]
+                selected_hotel = hotels[hi] if hotels else None
                 res = await book_agent(selected_flight, selected_hotel)
-                self.accumulator["booking"] = res
-                return json.dumps(res)
+                self.accumulator.booking = res
+                return orjson.dumps(res).decode()
 
-            raise ValueError(f"Unknown tool: {tool_name}")
+            return orjson.dumps({"error": f"Unknown tool: {tool_name}"}).decode()
+
+        async def bounded_tool(name: str, args: Dict[str, Any]) -> str:
+            async with _tool_semaphore():
+                try:
+                    out = await handle_tool(name, args)
+                except (TypeError, ValueError, IndexError) as e:
+                    # Schema-valid args can still miss an agent's signature, pydantic's rules
+                    # (ValidationError is a ValueError) or a real calendar date.
+                    out = orjson.dumps({"error": f"invalid args: {e}"}).decode()
+            return tool_reply(out)
+
+        def tool_reply(out: str) -> str:
+            # Send only this tool's result plus a one-line view of the rest of the state.
+            return f'{{"result":{out},"state":{orjson.dumps(self.accumulator.summary()).decode()}}}'
+
+        def start_tool(name: str, raw_args: Optional[str]) -> asyncio.Future:
+            try:
+                args = orjson.loads(raw_args or "{}")
+            except orjson.JSONDecodeError as e:
+                # Malformed arguments are the most common bad LLM output; let GPT retry the call.
+                fut = asyncio.get_running_loop().create_future()
+                fut.set_result(tool_reply(orjson.dumps({"error": f"invalid args: {e}"}).decode()))
+                return fut
+            key = (name, orjson.dumps(args, option=orjson.OPT_SORT_KEYS))
+            return asyncio.ensure_future(singleflight(self._inflight, key, lambda: bounded_tool(name, args)))
 
         for _ in range(8):  # hard cap to avoid infinite loops
-            resp = client.chat.completions.create(
+            request = dict(
                 model="gpt-5",
                 messages=messages,
                 tools=TOOLS,
                 tool_choice="auto",
                 temperature=0.2,
+                prompt_cache_key=PROMPT_CACHE_KEY,
+                stream_options={"include_usage": True},
             )
+            # Keyed by call id: the same tool may be requested more than once per turn.
+            tasks: Dict[str, asyncio.Future] = {}
+
+            # SQLite I/O runs off the event loop.
+            resp = await asyncio.to_thread(llm_cache.lookup, request)
+            cached = resp is not None
+            if not cached:
+                try:
+                    async with _client().chat.completions.stream(**request) as stream:
+                        async for event in stream:
+                            if event.type == "tool_calls.function.arguments.done":
+                                # Start the tool while the rest of the turn is still streaming.
+                                snapshot = stream.current_completion_snapshot.choices[0].message
+                                tasks[snapshot.tool_calls[event.index].id] = start_tool(event.name, event.arguments)
+                        resp = await self._finish_stream(stream)
+                except BaseException:
+                    # The turn is lost; don't leave its tools running against the accumulator.
+                    self._cancel_tools(tasks)
+                    raise
             choice = resp.choices[0]
             msg = choice.message
 
             if not getattr(msg, "tool_calls", None):
                 try:
-                    data = json.loads(msg.content)
-                    return Itinerary(**data)
-                except Exception:
+                    itinerary = Itinerary.model_validate_json(msg.content or "")
+                except ValidationError as e:
                     messages.append({"role": "assistant", "content": msg.content})
                     messages.append({
                         "role": "user",
-                        "content": "Please output valid JSON strictly matching the Itinerary schema."
+                        "content": (
+                            "Please output valid JSON strictly matching the Itinerary schema. "
+                            f"Fix these errors: {e.json(include_url=False, include_input=False)}"
+                        ),
                     })
                     continue
+                # Only answers that validate are worth replaying on the next identical run.
+                if not cached:
+                    await asyncio.to_thread(llm_cache.store, request, resp)
+                return itinerary
 
-            results: Dict[str, str] = {}
-            pending = []
-            for tc in msg.tool_calls:
-                name = tc.function.name
-                args = json.loads(tc.function.arguments or "{}")
-                pending.append((name, args))
-
-            async def _run_all():
-                async def _one(n, a):
-                    return n, await handle_tool(n, a)
-                return await asyncio.gather(*[_one(n, a) for n, a in pending])
-
-            outs = await _run_all()
-            for n, o in outs:
-                results[n] = o
+            messages.append({
+                "role": "assistant",
+                "content": msg.content,
+                "tool_calls": [
+                    {"id": tc.id, "type": "function", "function": {"name": tc.function.name, "arguments": tc.function.arguments}}
+                    for tc in msg.tool_calls
+                ],
+            })
 
             for tc in msg.tool_calls:
+                if tc.id not in tasks:
+                    tasks[tc.id] = start_tool(tc.function.name, tc.function.arguments)
+            try:
+                outs = await asyncio.gather(*(tasks[tc.id] for tc in msg.tool_calls))
+            except BaseException:
+                self._cancel_tools(tasks)
+                raise
+
+            for tc, out in zip(msg.tool_calls, outs):
                 messages.append({
                     "role": "tool",
                     "tool_call_id": tc.id,
                     "name": tc.function.name,
-                    "content": results[tc.function.name],
+                    "content": out,
                 })
+            self.snapshots.append(self.snapshot())
 
         raise RuntimeError("Failed to produce itinerary in allotted steps")
 
@@ -169,10 +357,14 @@ async def example():
     )
 
     orchestrator = TravelOrchestrator()
-    itinerary = await orchestrator.run(user_goal=user_goal, default_prefs=prefs, auto_book=True)
+    try:
+        itinerary = await orchestrator.run(user_goal=user_goal, default_prefs=prefs, auto_book=True)
+    finally:
+        await http_client.aclose()
 
+    print(f"\nPrompt tokens served from cache: {orchestrator.usage['cached_tokens']}/{orchestrator.usage['prompt_tokens']}")
     print("\n=== Final Itinerary ===")
-    print(json.dumps(itinerary.dict(), indent=2))
+    print(itinerary.model_dump_json(indent=2))
 
 if __name__ == "__main__":
     asyncio.run(example())
\ No newline at end of file
@@ -1,20 +1,30 @@
-import os
-import json
 import asyncio
 import datetime as dt
-from typing import List, Optional, Literal, Dict, Any
+import functools
+import inspect
+from typing import List, Optional, Literal, Dict, Any, Awaitable, Callable
 from pydantic import BaseModel, Field, validator
 import httpx
-from openai import OpenAI
+import numpy as np
+import orjson
+import fastjsonschema
+from cachetools import TTLCache
 
 # =========================
 # Config
 # =========================
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Please set OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Shared by every domain agent so parallel tool calls multiplex over warm connections.
+http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=httpx.Timeout(10, connect=3),
+)
+
+@functools.lru_cache(maxsize=4096)
+def _parse(s: str) -> dt.date:
+    # Trip dates repeat across every tool call and orchestrator turn; parse each string once.
+    return dt.date.fromisoformat(s)
 
 # =========================
 # Pydantic Schemas
@@ -56,7 +66,7 @@ class TravelerPrefs(BaseModel):
     origin: str
     destination: str
     depart_date: str
-    return_date: Optional[str]
+    return_date: Optional[str] = None
     travelers: int = 1
     cabin: Literal["economy", "premium_economy", "business", "first"] = "economy"
     budget_currency: str = "USD"
@@ -68,7 +78,7 @@ class TravelerPrefs(BaseModel):
     def _check_date(cls, v):
         if v is None:
             return v
-        dt.date.fromisoformat(v)  # raises if invalid
+        _parse(v)  # raises if invalid
         return v
 class ItineraryDay(BaseModel):
     date: str
@@ -86,26 +96,85 @@ class Itinerary(BaseModel):
     est_total_currency: str
     est_total_amount: float
 
+def to_soa(models: List[BaseModel]) -> Dict[str, List[Any]]:
+    """
+    Columnar (struct-of-arrays) view of a list of flat models: one list per field,
+    so field names go over the wire once instead of once per option.
+    """
+    if not models:
+        return {}
+    return {f: [getattr(m, f) for m in models] for f in type(models[0]).model_fields}
+
 # =========================
 # Domain Agent Stubs (replace with real APIs)
 # =========================
+_CONDITIONS = np.array(["clear", "partly cloudy", "light rain"])
+
+# Per-city facts are shared by every traveler, so they are cached across users for 10 minutes.
+# Flights and hotels depend on traveler count/rooms and are deliberately not cached.
+_wx_cache = TTLCache(maxsize=10_000, ttl=600)
+_events_cache = TTLCache(maxsize=10_000, ttl=600)
+
+async def singleflight(inflight: Dict[Any, asyncio.Future], key: Any, call: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Run `call()` once per `key` at a time: concurrent callers with the same key
+    await the task already in `inflight` instead of starting their own.
+    """
+    fut = inflight.get(key)
+    if fut is None:
+        fut = asyncio.ensure_future(call())
+        inflight[key] = fut
+        fut.add_done_callback(lambda _: inflight.pop(key, None))
+    # Shield so one cancelled waiter doesn't cancel the call for the others; to stop
+    # the call itself, cancel the task in `inflight`.
+    return await asyncio.shield(fut)
+
+def _fresh(value: Any) -> Any:
+    # Cached results are shared across users; hand each caller its own copy.
+    if isinstance(value, list):
+        return [_fresh(v) for v in value]
+    return value.model_copy(deep=True)
+
+def _coalesced(cache: TTLCache):
+    """
+    Serve repeat calls from `cache`, and have concurrent callers with the same
+    arguments await one shared upstream call instead of each firing their own.
+    """
+    def decorate(fn):
+        sig = inspect.signature(fn)
+        inflight: Dict[Any, asyncio.Future] = {}
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tuple(
+                (name, tuple(v) if isinstance(v, list) else v)
+                for name, v in bound.arguments.items()
+            )
+            hit = cache.get(key)
+            if hit is None:
+                # Only successful calls reach the cache; a failure propagates to every waiter.
+                hit = cache[key] = await singleflight(inflight, key, lambda: fn(*args, **kwargs))
+            return _fresh(hit)
+        return wrapper
+    return decorate
+
+@_coalesced(_wx_cache)
 async def weather_agent(city: str, start_date: str, end_date: str) -> WeatherSummary:
-    # TODO: Replace with OpenWeather/VisualCrossing/etc.
-    start = dt.date.fromisoformat(start_date)
-    end = dt.date.fromisoformat(end_date)
-    days = (end - start).days + 1
-    highs = [26.0 + i % 3 for i in range(days)]
-    lows  = [18.0 + i % 3 for i in range(days)]
-    conds = ["clear", "partly cloudy", "light rain"] * ((days // 3) + 1)
+    # TODO: Replace with OpenWeather/VisualCrossing/etc. via `http_client`.
+    start = np.datetime64(start_date, "D")
+    days = int((np.datetime64(end_date, "D") - start).astype(np.int64)) + 1
+    idx = np.arange(max(days, 0), dtype=np.int64)
     return WeatherSummary(
         city=city,
-        dates=[(start + dt.timedelta(days=i)).isoformat() for i in range(days)],
-        highs_c=highs[:days],
-        lows_c=lows[:days],
-        conditions=conds[:days],
+        dates=(start + idx).astype(str).tolist(),
+        highs_c=(26.0 + idx % 3).tolist(),
+        lows_c=(18.0 + idx % 3).tolist(),
+        conditions=_CONDITIONS[idx % 3].tolist(),
     )
 async def flights_agent(prefs: TravelerPrefs) -> List[FlightOption]:
-    # TODO: Replace with Amadeus/Skyscanner/Sabre/etc.
+    # TODO: Replace with Amadeus/Skyscanner/Sabre/etc. via `http_client`.
     return [
         FlightOption(
             carrier="Example Air",
@@ -128,10 +197,9 @@ async def flights_agent(prefs: TravelerPrefs) -> List[FlightOption]:
             price_total=520.0 * prefs.travelers,
         ),
     ]
-async def hotels_agent(destination: str, checkin: str, checkout: str, rooms: int, max_price_per_night: Optional[float], currency: str) -> List[HotelOption]:
-    # TODO: Replace with Booking.com/Hotels.com/Expedia API, etc.
-    nights = (dt.date.fromisoformat(checkin) - dt.date.fromisoformat(checkout)).days
-    nights = abs(nights) or 1
+async def hotels_agent(destination: str, checkin: str, checkout: str, rooms: int, max_price_per_night: Optional[float] = None, currency: str = "USD") -> List[HotelOption]:
+    # TODO: Replace with Booking.com/Hotels.com/Expedia API, etc. via `http_client`.
+    nights = max(1, (_parse(checkout) - _parse(checkin)).days)
     base = 140.0
     total = base * nights * rooms
     return [
@@ -156,8 +224,9 @@ async def hotels_agent(destination: str, checkin: str, checkout: str, rooms: int
             cancellation_policy="Partial refund",
         ),
     ]
-async def events_agent(city: str, start_date: str, end_date: str, interests: List[str]) -> List[EventOption]:
-    # TODO: Replace with Eventbrite/Ticketmaster/Local event APIs.
+@_coalesced(_events_cache)
+async def events_agent(city: str, start_date: str, end_date: str, interests: Optional[List[str]] = None) -> List[EventOption]:
+    # TODO: Replace with Eventbrite/Ticketmaster/Local event APIs via `http_client`.
     return [
         EventOption(
             title="Open-Air Food Market",
@@ -171,7 +240,7 @@ async def events_agent(city: str, start_date: str, end_date: str, interests: Lis
         ),
         EventOption(
             title="Live Jazz Night",
-            start=f"{(dt.date.fromisoformat(start_date) + dt.timedelta(days=1)).isoformat()}T20:00",
+            start=f"{(_parse(start_date) + dt.timedelta(days=1)).isoformat()}T20:00",
             venue="Blue Note Club",
             category="music",
             price_currency="USD",
@@ -200,8 +269,8 @@ TOOLS = [
                 "type": "object",
                 "properties": {
                     "city": {"type": "string"},
-                    "start_date": {"type": "string", "description": "YYYY-MM-DD"},
-                    "end_date": {"type": "string", "description": "YYYY-MM-DD"},
+                    "start_date": {"type": "string", "format": "date", "description": "YYYY-MM-DD"},
+                    "end_date": {"type": "string", "format": "date", "description": "YYYY-MM-DD"},
                 },
                 "required": ["city", "start_date", "end_date"],
             },
@@ -221,12 +290,12 @@ TOOLS = [
                         "properties": {
                             "origin": {"type": "string"},
                             "destination": {"type": "string"},
-                            "depart_date": {"type": "string"},
-                            "return_date": {"type": "string"},
+                            "depart_date": {"type": "string", "format": "date"},
+                            "return_date": {"type": ["string", "null"], "format": "date"},
                             "travelers": {"type": "number"},
                             "cabin": {"type": "string"},
                             "budget_currency": {"type": "string"},
-                            "max_flight_price": {"type": "number"},
+                            "max_flight_price": {"type": ["number", "null"]},
                         },
                         "required": ["origin", "destination", "depart_date", "travelers", "cabin", "budget_currency"],
                     }
@@ -244,10 +313,10 @@ TOOLS = [
                 "type": "object",
                 "properties": {
                     "destination": {"type": "string"},
-                    "checkin": {"type": "string"},
-                    "checkout": {"type": "string"},
+                    "checkin": {"type": "string", "format": "date"},
+                    "checkout": {"type": "string", "format": "date"},
                     "rooms": {"type": "number"},
-                    "max_price_per_night": {"type": "number"},
+                    "max_price_per_night": {"type": ["number", "null"]},
                     "currency": {"type": "string"},
                 },
                 "required": ["destination", "checkin", "checkout", "rooms", "currency"],
@@ -263,9 +332,9 @@ TOOLS = [
                 "type": "object",
                 "properties": {
                     "city": {"type": "string"},
-                    "start_date": {"type": "string"},
-                    "end_date": {"type": "string"},
-                    "interests": {"type": "array", "items": {"type": "string"}},
+                    "start_date": {"type": "string", "format": "date"},
+                    "end_date": {"type": "string", "format": "date"},
+                    "interests": {"type": ["array", "null"], "items": {"type": "string"}},
                 },
                 "required": ["city", "start_date", "end_date"],
             },
@@ -279,11 +348,19 @@ TOOLS = [
             "parameters": {
                 "type": "object",
                 "properties": {
-                    "flight_index": {"type": "number"},
-                    "hotel_index": {"type": "number"},
+                    "flight_index": {"type": "integer", "minimum": 0},
+                    "hotel_index": {"type": "integer", "minimum": 0},
                 },
                 "required": ["flight_index"],
             },
         },
     },
 ]
+
+# Canonical encoding of TOOLS, computed once; use it wherever the schema must be hashed or compared.
+TOOLS_JSON = orjson.dumps(TOOLS)
+
+# Compiled once per tool; cheap enough to check every GPT-supplied argument set before dispatch.
+TOOL_VALIDATORS = {
+    t["function"]["name"]: fastjsonschema.compile(t["function"]["parameters"]) for t in TOOLS
+}